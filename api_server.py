@@ -0,0 +1,322 @@
+"""
+查询API - 只读HTTP/JSON接口, 供其他服务获取HV/VIX序列和最新数据
+
+基于chart_generator的加载函数, 标准库WSGI实现:
+- GET /api/series/<kind>/<code>?start=YYYY-MM-DD&end=YYYY-MM-DD&columns=a,b   kind: price / hv / vix
+- GET /api/latest/<code>   固定返回LATEST_FIELDS中的字段, 不可用的值为null
+  (快照缺失时只能从文件末行读取数值, 各百分位为null)
+
+ETag/Last-Modified由数据文件的修改时间和大小生成(只stat不读取),
+条件请求命中时直接返回304; 未命中时结果按ETag缓存在进程内。
+gzip与未压缩响应是不同的表示, gzip响应的ETag带-gz后缀。
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIServer, make_server
+
+import pandas as pd
+
+# 添加路径
+sys.path.append(os.path.dirname(__file__))
+
+import chart_generator
+from chart_generator import (
+    load_etf_data,
+    load_hv_data,
+    load_vix_data,
+    load_latest_values
+)
+
+CODE_PATTERN = re.compile(r'^\d{6}\.(SH|SZ)$')
+CACHE_SIZE = 256
+
+# 序列类型 -> (加载函数, 数据文件相对路径模板)
+SERIES = {
+    'price': (load_etf_data, ('volatility', '{code}_full_history.csv')),
+    'hv': (load_hv_data, ('volatility', '{code}_with_hv.csv')),
+    'vix': (load_vix_data, ('vix', '{code}_vix.csv'))
+}
+
+LATEST_FILES = [
+    ('latest', '{code}_latest.json'),
+    ('volatility', '{code}_full_history.csv'),
+    ('volatility', '{code}_with_hv.csv'),
+    ('vix', '{code}_vix.csv')
+]
+
+# /api/latest 返回的字段
+LATEST_FIELDS = [
+    'last_date', 'price', 'price_pct_all', 'price_pct_1y',
+    'hv_date', 'HV20', 'HV60', 'HV252', 'hv20_pct_all', 'hv20_pct_1y',
+    'vix_date', 'VIX', 'vix_pct_all', 'vix_pct_1y'
+]
+
+STATUS_TEXT = {
+    200: '200 OK',
+    304: '304 Not Modified',
+    400: '400 Bad Request',
+    404: '404 Not Found',
+    405: '405 Method Not Allowed'
+}
+
+class ApiError(Exception):
+    """请求错误, 返回对应状态码和错误信息"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class ResponseCache:
+    """按(路径, 查询串, 编码)缓存响应体, 带ETag校验的LRU"""
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+cache = ResponseCache()
+
+def _data_files(templates, code):
+    """数据文件的绝对路径"""
+    return [os.path.join(chart_generator.DATA_DIR, folder, name.format(code=code)) for folder, name in templates]
+
+def _data_version(paths):
+    """由文件修改时间和大小生成版本, 返回(版本串, 最后修改时间); 文件都不存在时版本为None"""
+    parts = []
+    last_modified = None
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            parts.append(f'{path}:-')
+            continue
+        parts.append(f'{path}:{stat.st_mtime_ns}:{stat.st_size}')
+        last_modified = max(last_modified or 0, stat.st_mtime)
+    
+    if last_modified is None:
+        return None, None
+    return '|'.join(parts), last_modified
+
+def _parse_date(query, key):
+    """解析查询参数中的日期"""
+    value = query.get(key, [None])[0]
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value).normalize()
+    except (ValueError, TypeError):
+        raise ApiError(400, f'无效的日期参数 {key}: {value}')
+
+def _clean(value):
+    """NaN转为null, 保证输出合法JSON"""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, 'item'):
+        return _clean(value.item())
+    return value
+
+def _series_payload(kind, code, query):
+    """序列数据"""
+    load_func = SERIES[kind][0]
+    start = _parse_date(query, 'start')
+    end = _parse_date(query, 'end')
+    
+    df = load_func(code, start, end)
+    if df is None:
+        raise ApiError(404, f'{code} 的{kind}数据不存在')
+    
+    columns = [c for c in query.get('columns', [''])[0].split(',') if c]
+    if columns:
+        unknown = [c for c in columns if c not in df.columns]
+        if unknown:
+            raise ApiError(400, f'未知的列: {",".join(unknown)}')
+        df = df[columns]
+    
+    df = df.reset_index()
+    df['trade_date'] = df['trade_date'].dt.strftime('%Y-%m-%d')
+    records = json.loads(df.to_json(orient='records', force_ascii=False))
+    
+    return {
+        'code': code,
+        'kind': kind,
+        'start': records[0]['trade_date'] if records else None,
+        'end': records[-1]['trade_date'] if records else None,
+        'columns': list(df.columns),
+        'data': records
+    }
+
+def _latest_payload(code):
+    """最新数据"""
+    values = load_latest_values(code)
+    if values is None:
+        raise ApiError(404, f'{code} 的最新数据不存在')
+    return {'code': code, **{key: _clean(values.get(key)) for key in LATEST_FIELDS}}
+
+def _route(path, query):
+    """路由: 返回(依赖的数据文件, 生成响应体的函数)"""
+    parts = [p for p in path.split('/') if p]
+    
+    if len(parts) == 4 and parts[:2] == ['api', 'series']:
+        kind, code = parts[2], parts[3]
+        if kind not in SERIES:
+            raise ApiError(404, f'未知的序列类型: {kind}')
+        if not CODE_PATTERN.match(code):
+            raise ApiError(400, f'无效的代码: {code}')
+        return _data_files([SERIES[kind][1]], code), lambda: _series_payload(kind, code, query)
+    
+    if len(parts) == 3 and parts[:2] == ['api', 'latest']:
+        code = parts[2]
+        if not CODE_PATTERN.match(code):
+            raise ApiError(400, f'无效的代码: {code}')
+        return _data_files(LATEST_FILES, code), lambda: _latest_payload(code)
+    
+    raise ApiError(404, f'未知的路径: {path}')
+
+def _not_modified(environ, etag, last_modified):
+    """条件请求是否命中"""
+    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    
+    if_modified_since = environ.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    
+    return False
+
+def _accepts_gzip(accept_encoding):
+    """按Accept-Encoding的q值判断是否接受gzip(q=0表示明确拒绝)"""
+    weights = {}
+    for token in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in token.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.lower()] = q
+    
+    for coding in ('gzip', 'x-gzip'):
+        if coding in weights:
+            return weights[coding] > 0
+    return weights.get('*', 0) > 0
+
+def _respond(start_response, status, headers, body=b''):
+    start_response(STATUS_TEXT[status], headers + [('Content-Length', str(len(body)))])
+    return [body]
+
+def application(environ, start_response):
+    """WSGI入口"""
+    method = environ.get('REQUEST_METHOD', 'GET')
+    path = environ.get('PATH_INFO', '/')
+    query_string = environ.get('QUERY_STRING', '')
+    json_header = [('Content-Type', 'application/json; charset=utf-8')]
+    
+    try:
+        if method not in ('GET', 'HEAD'):
+            raise ApiError(405, f'不支持的请求方法: {method}')
+        
+        query = parse_qs(query_string)
+        files, build = _route(path, query)
+        
+        version, last_modified = _data_version(files)
+        if version is None:
+            raise ApiError(404, f'数据不存在: {path}')
+        
+        use_gzip = _accepts_gzip(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        tag = hashlib.sha1(f'{path}?{query_string}#{version}'.encode('utf-8')).hexdigest()[:20]
+        etag = f'"{tag}-gz"' if use_gzip else f'"{tag}"'
+        headers = [
+            ('ETag', etag),
+            ('Last-Modified', formatdate(last_modified, usegmt=True)),
+            ('Cache-Control', 'no-cache'),
+            ('Vary', 'Accept-Encoding')
+        ]
+        
+        # 条件请求命中: 不读取数据文件
+        if _not_modified(environ, etag, last_modified):
+            return _respond(start_response, 304, headers)
+        
+        # 未压缩和gzip两种表示分别缓存, gzip表示由未压缩表示压缩得到
+        plain_key, plain_etag = (path, query_string, 'identity'), f'"{tag}"'
+        body = cache.get((path, query_string, 'gzip'), etag) if use_gzip else cache.get(plain_key, etag)
+        if body is None:
+            plain = cache.get(plain_key, plain_etag)
+            if plain is None:
+                plain = json.dumps(build(), ensure_ascii=False).encode('utf-8')
+                cache.put(plain_key, plain_etag, plain)
+            body = plain
+            if use_gzip:
+                body = gzip.compress(plain, mtime=0)
+                cache.put((path, query_string, 'gzip'), etag, body)
+        
+        headers = headers + json_header
+        if use_gzip:
+            headers.append(('Content-Encoding', 'gzip'))
+        
+        if method == 'HEAD':
+            start_response(STATUS_TEXT[200], headers + [('Content-Length', str(len(body)))])
+            return [b'']
+        return _respond(start_response, 200, headers, body)
+    
+    except ApiError as e:
+        body = json.dumps({'error': e.message}, ensure_ascii=False).encode('utf-8')
+        return _respond(start_response, e.status, json_header, body)
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """多线程WSGI服务器"""
+    daemon_threads = True
+
+def serve(host='127.0.0.1', port=8600):
+    """启动API服务"""
+    with make_server(host, port, application, server_class=ThreadingWSGIServer) as server:
+        print(f"API服务已启动: http://{host}:{port}")
+        server.serve_forever()
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='ETF波动率数据查询API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    args = parser.parse_args()
+    
+    serve(args.host, args.port)
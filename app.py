@@ -2,18 +2,25 @@
 ETF波动率分析仪表板 - Streamlit主应用
 """
 import streamlit as st
+import pandas as pd
 import sys
 import os
 
 # 添加路径
 sys.path.append(os.path.dirname(__file__))
 
-from data_updater import update_all_data, TARGET_ETFS
+from data_updater import update_all_data, TARGET_ETFS, VIX_METHODS, DEFAULT_VIX_METHOD
 from chart_generator import (
     generate_price_chart,
     generate_hv_chart,
+    generate_hv_cone_chart,
     generate_vix_chart,
-    get_latest_stats
+    generate_smile_chart,
+    generate_term_structure_chart,
+    get_latest_stats,
+    load_latest_snapshot,
+    load_latest_values,
+    VIEWPORT_MAX_POINTS
 )
 
 # 页面配置
@@ -54,14 +61,67 @@ with st.sidebar:
     selected_name = display_to_name[selected_display]
     selected_code = name_to_code[selected_name]
     
+    # 时间范围: 只读取并发送所选区间的数据
+    range_options = {
+        '全部': None,
+        '近3个月': pd.DateOffset(months=3),
+        '近6个月': pd.DateOffset(months=6),
+        '近1年': pd.DateOffset(years=1),
+        '近3年': pd.DateOffset(years=3),
+        '自定义': None
+    }
+    selected_range = st.selectbox("时间范围", list(range_options), index=0)
+    
+    # 区间从最新数据日期往前推算(数据未及时更新时也不会落在数据之外), 无数据时用今天
+    latest_values = load_latest_values(selected_code)
+    data_end = pd.Timestamp(latest_values['last_date']) if latest_values else pd.Timestamp.today().normalize()
+    
+    # 只在指定区间时重新聚合, "全部"视图与原来一样显示逐日数据
+    range_start, range_end = None, None
+    max_points = None
+    if selected_range == '自定义':
+        custom_range = st.date_input(
+            "选择区间",
+            value=((data_end - pd.DateOffset(years=1)).date(), data_end.date())
+        )
+        if len(custom_range) == 2:
+            range_start, range_end = (pd.Timestamp(d) for d in custom_range)
+    elif range_options[selected_range] is not None:
+        range_start = data_end - range_options[selected_range]
+    if range_start is not None or range_end is not None:
+        max_points = VIEWPORT_MAX_POINTS
+    
     st.markdown("---")
     
     # 更新按钮
     st.subheader("数据更新")
+    vix_method_names = {
+        'atm': 'ATM隐含波动率加权',
+        'variance_swap': '方差互换法(CBOE/iVIX)'
+    }
+    # 已有VIX使用的方法(来自快照), 默认沿用, 避免切换方法触发全部历史重算
+    stored_methods = {}
+    for etf in TARGET_ETFS:
+        snapshot = load_latest_snapshot(etf['code']) or {}
+        if snapshot.get('VIX') is not None or snapshot.get('vix_date') is not None:
+            stored_methods[etf['name']] = snapshot.get('vix_method', 'atm')
+    
+    stored_set = set(stored_methods.values())
+    default_method = stored_set.pop() if len(stored_set) == 1 else DEFAULT_VIX_METHOD
+    vix_method = st.selectbox(
+        "VIX计算方法",
+        list(VIX_METHODS),
+        index=list(VIX_METHODS).index(default_method),
+        format_func=lambda m: vix_method_names.get(m, m)
+    )
+    
+    recompute = [etf_display_names[name] for name, method in stored_methods.items() if method != vix_method]
+    if recompute:
+        st.warning(f"⚠️ {'、'.join(recompute)} 的已有VIX由其他方法计算,更新时将用所选方法重新计算全部历史")
     if st.button("🔄 更新所有数据", type="primary", use_container_width=True):
         with st.spinner("正在更新数据,请稍候..."):
             try:
-                results = update_all_data()
+                results = update_all_data(vix_method=vix_method)
                 st.success("✅ 数据更新完成!")
                 st.dataframe(results, use_container_width=True)
             except Exception as e:
@@ -87,7 +147,9 @@ try:
     # 图表1: 价格走势
     with st.container():
         st.subheader("1️⃣ 价格走势")
-        price_chart = generate_price_chart(selected_code, selected_display)
+        price_chart = generate_price_chart(
+            selected_code, selected_display, range_start, range_end, max_points
+        )
         
         if price_chart:
             st.plotly_chart(price_chart, use_container_width=True)
@@ -99,7 +161,9 @@ try:
     # 图表2: 历史波动率
     with st.container():
         st.subheader("2️⃣ 历史波动率 (HV20/60/252)")
-        hv_chart = generate_hv_chart(selected_code, selected_display)
+        hv_chart = generate_hv_chart(
+            selected_code, selected_display, range_start, range_end, max_points
+        )
         
         if hv_chart:
             st.plotly_chart(hv_chart, use_container_width=True)
@@ -113,6 +177,18 @@ try:
                 
                 波动率越高,市场波动越剧烈;波动率越低,市场越平稳。
                 """)
+            
+            cone_chart = generate_hv_cone_chart(selected_code, selected_display)
+            if cone_chart:
+                st.plotly_chart(cone_chart, use_container_width=True)
+                
+                with st.expander("📖 波动率锥说明"):
+                    st.markdown("""
+                    - 各期限(10/20/60/120/252日)历史波动率在全历史中的最小值、分位带和最大值
+                    - **红线**: 当前各期限的历史波动率
+                    
+                    红线靠近上沿说明当前处于高波动区间,靠近下沿说明处于低波动区间。
+                    """)
         else:
             st.warning("⚠️ 历史波动率数据不可用,请点击更新按钮")
     
@@ -120,8 +196,10 @@ try:
     
     # 图表3: VIX vs HV
     with st.container():
-        st.subheader("3️⃣ VIX vs 历史波动率 (2023至今)")
-        vix_chart = generate_vix_chart(selected_code, selected_display)
+        st.subheader("3️⃣ VIX vs 历史波动率" + (" (2023至今)" if range_start is None and range_end is None else ""))
+        vix_chart = generate_vix_chart(
+            selected_code, selected_display, range_start, range_end, max_points
+        )
         
         if vix_chart:
             st.plotly_chart(vix_chart, use_container_width=True)
@@ -139,6 +217,31 @@ try:
                 """)
         else:
             st.warning("⚠️ VIX数据不可用,请点击更新按钮")
+    
+    st.markdown("---")
+    
+    # 图表4: 波动率微笑与期限结构
+    with st.container():
+        st.subheader("4️⃣ 波动率微笑与期限结构")
+        smile_chart = generate_smile_chart(selected_code, selected_display)
+        term_chart = generate_term_structure_chart(selected_code, selected_display)
+        
+        if smile_chart and term_chart:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.plotly_chart(smile_chart, use_container_width=True)
+            with col2:
+                st.plotly_chart(term_chart, use_container_width=True)
+            
+            with st.expander("📖 微笑与期限结构说明"):
+                st.markdown("""
+                - **波动率微笑**: 同一到期月份不同行权价的隐含波动率,低行权价取认沽、高行权价取认购
+                - **期限结构**: 各到期月份平值期权的隐含波动率
+                
+                数据由更新流程逐合约预先计算(IV/Delta/Gamma/Vega/Theta),页面只读取最新交易日。
+                """)
+        else:
+            st.warning("⚠️ IV/Greeks数据不可用,请点击更新按钮")
 
 except Exception as e:
     st.error(f"❌ 加载图表时出错: {e}")
@@ -4,6 +4,8 @@
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import io
+import json
 import os
 import sys
 
@@ -14,42 +16,222 @@ sys.path.insert(0, parent_dir)
 # 数据路径
 DATA_DIR = os.path.join(parent_dir, 'data')
 
-def load_etf_data(code):
-    """加载ETF历史数据"""
+# 视窗模式下每条曲线发送给浏览器的最大点数
+VIEWPORT_MAX_POINTS = 500
+
+# VIX图默认起始日期
+VIX_DEFAULT_START = '2023-01-01'
+
+def _parse_line_date(line, date_col):
+    """解析CSV数据行中的日期字段, 空行返回None"""
+    fields = line.decode('utf-8').rstrip('\r\n').split(',')
+    if len(fields) <= date_col or not fields[date_col]:
+        return None
+    return pd.Timestamp(fields[date_col]).normalize()
+
+def _seek_date(f, data_start, size, date_col, target, after=False):
+    """二分查找第一个日期 >= target(after=True时为 > target)的数据行的字节偏移"""
+    def line_start(pos):
+        # pos处或之后的第一个行首
+        if pos <= data_start:
+            return data_start
+        f.seek(pos - 1)
+        f.readline()
+        return f.tell()
+    
+    def reached(pos):
+        offset = line_start(pos)
+        if offset >= size:
+            return True
+        f.seek(offset)
+        date = _parse_line_date(f.readline(), date_col)
+        return date is None or (date > target if after else date >= target)
+    
+    lo, hi = data_start, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if reached(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return line_start(lo)
+
+def _read_csv_window(file_path, start=None, end=None):
+    """读取按trade_date升序排列的CSV中[start, end]区间的行
+    
+    通过字节偏移二分定位区间首尾, 磁盘读取量只与区间长度有关
+    """
+    if start is None and end is None:
+        return pd.read_csv(file_path, dtype={'trade_date': str})
+    
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        date_col = header.decode('utf-8').strip().split(',').index('trade_date')
+        data_start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        
+        begin = data_start
+        if start is not None:
+            begin = _seek_date(f, data_start, size, date_col, pd.Timestamp(start).normalize())
+        stop = size
+        if end is not None:
+            stop = _seek_date(f, data_start, size, date_col, pd.Timestamp(end).normalize(), after=True)
+        
+        f.seek(begin)
+        chunk = f.read(max(stop - begin, 0))
+    
+    return pd.read_csv(io.BytesIO(header + chunk), dtype={'trade_date': str})
+
+def _downsample(df, max_points, how='mean'):
+    """视窗模式: 按等长时间桶重新聚合, 使点数不超过max_points
+    
+    每个桶的值标在桶内最后一个实际交易日上, 最后一个点即为真实的最新日期
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    
+    span_days = (df.index[-1] - df.index[0]).days + 1
+    bucket_days = -(-span_days // max_points)
+    bucket = (df.index - df.index[0]).days // bucket_days
+    
+    result = df.groupby(bucket).agg(how)
+    result.index = df.index.to_series().groupby(bucket).max().rename(df.index.name)
+    return result.dropna(how='all')
+
+def _percentile(values, current):
+    """current在values中的百分位"""
+    values = values.dropna()
+    if len(values) == 0:
+        return float('nan')
+    return (values < current).sum() / len(values) * 100
+
+def _year_window(df, load_func, code):
+    """截至区间末尾过去一年的数据; 区间不足一年时单独读取"""
+    one_year_ago = df.index[-1] - pd.Timedelta(days=365)
+    if df.index[0] <= one_year_ago:
+        return df[df.index >= one_year_ago]
+    return load_func(code, one_year_ago, df.index[-1])
+
+def _read_last_row(file_path):
+    """从文件末尾向前查找, 只读取CSV的表头和最后一行"""
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        pos = os.fstat(f.fileno()).st_size
+        
+        tail = b''
+        while pos > data_start:
+            step = min(4096, pos - data_start)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+            lines = tail.strip().split(b'\n')
+            if len(lines) > 1 or pos == data_start:
+                break
+        
+        last_line = tail.strip().split(b'\n')[-1]
+    
+    if not last_line:
+        return None
+    df = pd.read_csv(io.BytesIO(header + last_line + b'\n'), dtype={'trade_date': str})
+    return df.iloc[-1]
+
+def load_latest_snapshot(code):
+    """加载更新流程写入的最新数据快照"""
+    file_path = os.path.join(DATA_DIR, 'latest', f'{code}_latest.json')
+    if not os.path.exists(file_path):
+        return None
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _snapshot_percentiles(code, date_key, prefix, current_date):
+    """快照中与current_date同一天的全历史/过去一年百分位, 不可用时返回None"""
+    snapshot = load_latest_snapshot(code)
+    if snapshot is None or snapshot.get(date_key) != f'{current_date:%Y-%m-%d}':
+        return None
+    
+    all_percentile = snapshot.get(f'{prefix}_pct_all')
+    year_percentile = snapshot.get(f'{prefix}_pct_1y')
+    if all_percentile is None or year_percentile is None:
+        return None
+    return all_percentile, year_percentile
+
+def load_etf_data(code, start=None, end=None):
+    """加载ETF历史数据(可指定日期区间)"""
     file_path = os.path.join(DATA_DIR, 'volatility', f'{code}_full_history.csv')
     if not os.path.exists(file_path):
         return None
     
-    df = pd.read_csv(file_path)
+    df = _read_csv_window(file_path, start, end)
     df['trade_date'] = pd.to_datetime(df['trade_date']).dt.normalize()  # 只保留日期部分
     df = df.sort_values('trade_date').set_index('trade_date')
     return df
 
-def load_hv_data(code):
-    """加载历史波动率数据"""
+def load_hv_data(code, start=None, end=None):
+    """加载历史波动率数据(可指定日期区间)"""
     file_path = os.path.join(DATA_DIR, 'volatility', f'{code}_with_hv.csv')
     if not os.path.exists(file_path):
         return None
     
-    df = pd.read_csv(file_path)
+    df = _read_csv_window(file_path, start, end)
     df['trade_date'] = pd.to_datetime(df['trade_date']).dt.normalize()  # 只保留日期部分
     df = df.set_index('trade_date')
     return df
 
-def load_vix_data(code):
-    """加载VIX数据"""
+def load_vix_data(code, start=None, end=None):
+    """加载VIX数据(可指定日期区间)"""
     file_path = os.path.join(DATA_DIR, 'vix', f'{code}_vix.csv')
     if not os.path.exists(file_path):
         return None
     
-    df = pd.read_csv(file_path)
-    df['trade_date'] = pd.to_datetime(df['trade_date']).dt.normalize()  # 只保留日期部分  
+    df = _read_csv_window(file_path, start, end)
+    df['trade_date'] = pd.to_datetime(df['trade_date']).dt.normalize()  # 只保留日期部分
     df = df.set_index('trade_date')
     return df
 
-def generate_price_chart(code, name):
-    """生成价格走势图"""
-    df = load_etf_data(code)
+def load_hv_cone_data(code):
+    """加载预计算的波动率锥表"""
+    file_path = os.path.join(DATA_DIR, 'volatility', f'{code}_hv_cone.csv')
+    if not os.path.exists(file_path):
+        return None
+    
+    df = pd.read_csv(file_path)
+    df = df.sort_values('horizon').set_index('horizon')
+    return df
+
+def _greeks_partitions(code):
+    """按月份排序的Greeks分区文件"""
+    greeks_dir = os.path.join(DATA_DIR, 'greeks', code)
+    if not os.path.isdir(greeks_dir):
+        return []
+    return [os.path.join(greeks_dir, f) for f in sorted(os.listdir(greeks_dir)) if f.endswith('.parquet')]
+
+def load_greeks_data(code, trade_date=None):
+    """加载单日逐合约IV/Greeks数据(默认最新交易日), 只读取所在月份的分区"""
+    partitions = _greeks_partitions(code)
+    if not partitions:
+        return None
+    
+    if trade_date is None:
+        part_path = partitions[-1]
+    else:
+        trade_date = pd.Timestamp(trade_date).normalize()
+        part_path = os.path.join(DATA_DIR, 'greeks', code, f'{trade_date:%Y%m}.parquet')
+        if not os.path.exists(part_path):
+            return None
+    
+    df = pd.read_parquet(part_path)
+    day = trade_date if trade_date is not None else df['trade_date'].max()
+    return df[df['trade_date'] == day].reset_index(drop=True)
+
+def generate_price_chart(code, name, start=None, end=None, max_points=None):
+    """生成价格走势图
+    
+    指定start/end时只读取该区间, 标题百分位改为区间内及截至区间末尾的过去一年;
+    max_points用于视窗模式下重新聚合发送给浏览器的点数
+    """
+    df = load_etf_data(code, start, end)
     
     if df is None or df.empty:
         return None
@@ -57,16 +239,25 @@ def generate_price_chart(code, name):
     # 计算百分位
     current_price = df.iloc[-1]['close']
     
-    # 全历史百分位
-    all_percentile = (df['close'] < current_price).sum() / len(df) * 100
+    all_label = '全历史' if start is None and end is None else '区间'
+    cached = None
+    if start is None and end is None:
+        cached = _snapshot_percentiles(code, 'last_date', 'price', df.index[-1])
     
-    # 过去一年百分位
-    one_year_ago = df.index[-1] - pd.Timedelta(days=365)
-    df_1y = df[df.index >= one_year_ago]
-    if len(df_1y) > 0:
-        year_percentile = (df_1y['close'] < current_price).sum() / len(df_1y) * 100
+    if cached:
+        all_percentile, year_percentile = cached
     else:
-        year_percentile = all_percentile
+        # 全历史(区间)百分位
+        all_percentile = _percentile(df['close'], current_price)
+        
+        # 过去一年百分位
+        df_1y = _year_window(df, load_etf_data, code)
+        if df_1y is not None and len(df_1y) > 0:
+            year_percentile = _percentile(df_1y['close'], current_price)
+        else:
+            year_percentile = all_percentile
+    
+    df = _downsample(df[['close']], max_points, how='last')
     
     fig = go.Figure()
     
@@ -89,7 +280,7 @@ def generate_price_chart(code, name):
     )
     
     fig.update_layout(
-        title=f'{name} 价格走势 | 当前百分位: 全历史 {all_percentile:.1f}% / 过去一年 {year_percentile:.1f}%',
+        title=f'{name} 价格走势 | 当前百分位: {all_label} {all_percentile:.1f}% / 过去一年 {year_percentile:.1f}%',
         xaxis_title='日期',
         yaxis_title='价格 (元)',
         hovermode='x unified',
@@ -99,9 +290,9 @@ def generate_price_chart(code, name):
     
     return fig
 
-def generate_hv_chart(code, name):
-    """生成历史波动率图"""
-    df = load_hv_data(code)
+def generate_hv_chart(code, name, start=None, end=None, max_points=None):
+    """生成历史波动率图(区间与视窗参数同generate_price_chart)"""
+    df = load_hv_data(code, start, end)
     
     if df is None or df.empty:
         return None
@@ -109,16 +300,25 @@ def generate_hv_chart(code, name):
     # 计算HV20百分位
     current_hv20 = df.iloc[-1]['HV20']
     
-    # 全历史百分位
-    all_percentile = (df['HV20'].dropna() < current_hv20).sum() / df['HV20'].dropna().count() * 100
+    all_label = '全历史' if start is None and end is None else '区间'
+    cached = None
+    if start is None and end is None:
+        cached = _snapshot_percentiles(code, 'hv_date', 'hv20', df.index[-1])
     
-    # 过去一年百分位
-    one_year_ago = df.index[-1] - pd.Timedelta(days=365)
-    df_1y = df[df.index >= one_year_ago]
-    if len(df_1y) > 0 and df_1y['HV20'].dropna().count() > 0:
-        year_percentile = (df_1y['HV20'].dropna() < current_hv20).sum() / df_1y['HV20'].dropna().count() * 100
+    if cached:
+        all_percentile, year_percentile = cached
     else:
-        year_percentile = all_percentile
+        # 全历史(区间)百分位
+        all_percentile = _percentile(df['HV20'], current_hv20)
+        
+        # 过去一年百分位
+        df_1y = _year_window(df, load_hv_data, code)
+        if df_1y is not None and df_1y['HV20'].dropna().count() > 0:
+            year_percentile = _percentile(df_1y['HV20'], current_hv20)
+        else:
+            year_percentile = all_percentile
+    
+    df = _downsample(df[['HV20', 'HV60', 'HV252']], max_points)
     
     fig = go.Figure()
     
@@ -160,7 +360,7 @@ def generate_hv_chart(code, name):
     )
     
     fig.update_layout(
-        title=f'{name} 历史波动率 | HV20百分位: 全历史 {all_percentile:.1f}% / 过去一年 {year_percentile:.1f}%',
+        title=f'{name} 历史波动率 | HV20百分位: {all_label} {all_percentile:.1f}% / 过去一年 {year_percentile:.1f}%',
         xaxis_title='日期',
         yaxis_title='年化波动率 (%)',
         hovermode='x unified',
@@ -176,10 +376,93 @@ def generate_hv_chart(code, name):
     
     return fig
 
-def generate_vix_chart(code, name):
-    """生成VIX vs HV对比图 (2023至今)"""
-    vix_df = load_vix_data(code)
-    hv_df = load_hv_data(code)
+def generate_hv_cone_chart(code, name):
+    """生成历史波动率锥(只读取预计算的锥表)"""
+    df = load_hv_cone_data(code)
+    
+    if df is None or df.empty:
+        return None
+    
+    horizons = [f'{h}日' for h in df.index]
+    
+    fig = go.Figure()
+    
+    # 10%-90% 和 25%-75% 分位带
+    for low, high, color in [('p10', 'p90', 'rgba(31, 119, 180, 0.12)'),
+                             ('p25', 'p75', 'rgba(31, 119, 180, 0.25)')]:
+        fig.add_trace(go.Scatter(
+            x=horizons,
+            y=df[high],
+            mode='lines',
+            line=dict(width=0),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=horizons,
+            y=df[low],
+            mode='lines',
+            line=dict(width=0),
+            fill='tonexty',
+            fillcolor=color,
+            name=f'{low[1:]}%-{high[1:]}% 分位'
+        ))
+    
+    # 最大/中位/最小
+    fig.add_trace(go.Scatter(
+        x=horizons,
+        y=df['max'],
+        mode='lines',
+        name='最大值',
+        line=dict(color='gray', width=1, dash='dash')
+    ))
+    fig.add_trace(go.Scatter(
+        x=horizons,
+        y=df['p50'],
+        mode='lines',
+        name='中位数',
+        line=dict(color='#1f77b4', width=1.5)
+    ))
+    fig.add_trace(go.Scatter(
+        x=horizons,
+        y=df['min'],
+        mode='lines',
+        name='最小值',
+        line=dict(color='gray', width=1, dash='dash')
+    ))
+    
+    # 当前值
+    fig.add_trace(go.Scatter(
+        x=horizons,
+        y=df['current'],
+        mode='lines+markers',
+        name='当前',
+        line=dict(color='red', width=2),
+        marker=dict(size=8)
+    ))
+    
+    fig.update_layout(
+        title=f'{name} 波动率锥 | 截至 {df["last_date"].iloc[0]}',
+        xaxis_title='期限',
+        yaxis_title='年化波动率 (%)',
+        hovermode='x unified',
+        template='plotly_white',
+        height=400,
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="right",
+            x=0.99
+        )
+    )
+    
+    return fig
+
+def generate_vix_chart(code, name, start=None, end=None, max_points=None):
+    """生成VIX vs HV对比图(默认2023至今, 区间与视窗参数同generate_price_chart)"""
+    window_start = start if start is not None else VIX_DEFAULT_START
+    vix_df = load_vix_data(code, window_start, end)
+    hv_df = load_hv_data(code, window_start, end)
     
     if vix_df is None or hv_df is None:
         return None
@@ -187,26 +470,32 @@ def generate_vix_chart(code, name):
     # 合并数据
     df = pd.concat([vix_df['VIX'], hv_df[['HV20', 'HV252']]], axis=1).dropna()
     
-    # 筛选2023年至今
-    df = df[df.index >= '2023-01-01']
-    
     if df.empty:
         return None
     
-    # 计算VIX百分位(使用全部VIX数据,不只是2023年)
     current_vix = df.iloc[-1]['VIX']
     
-    # 全历史百分位(使用完整VIX数据)
-    full_vix = vix_df['VIX'].dropna()
-    all_percentile = (full_vix < current_vix).sum() / len(full_vix) * 100
+    # 默认视图优先使用快照中的全历史百分位, 否则读取完整VIX数据; 指定区间时使用区间内数据
+    all_label = '全历史' if start is None and end is None else '区间'
+    cached = None
+    if start is None and end is None:
+        cached = _snapshot_percentiles(code, 'vix_date', 'vix', df.index[-1])
     
-    # 过去一年百分位
-    one_year_ago = vix_df.index[-1] - pd.Timedelta(days=365)
-    vix_1y = vix_df[vix_df.index >= one_year_ago]['VIX'].dropna()
-    if len(vix_1y) > 0:
-        year_percentile = (vix_1y < current_vix).sum() / len(vix_1y) * 100
+    if cached:
+        all_percentile, year_percentile = cached
     else:
-        year_percentile = all_percentile
+        full_vix = load_vix_data(code)['VIX'] if start is None and end is None else vix_df['VIX']
+        all_percentile = _percentile(full_vix, current_vix)
+        
+        # 过去一年百分位
+        vix_1y = _year_window(vix_df, load_vix_data, code)
+        if vix_1y is not None and vix_1y['VIX'].dropna().count() > 0:
+            year_percentile = _percentile(vix_1y['VIX'], current_vix)
+        else:
+            year_percentile = all_percentile
+    
+    period = '2023至今' if start is None and end is None else f'{df.index[0]:%Y-%m-%d} 至 {df.index[-1]:%Y-%m-%d}'
+    df = _downsample(df, max_points)
     
     fig = go.Figure()
     
@@ -248,7 +537,7 @@ def generate_vix_chart(code, name):
     )
     
     fig.update_layout(
-        title=f'{name} VIX vs 历史波动率 (2023至今) | VIX百分位: 全历史 {all_percentile:.1f}% / 过去一年 {year_percentile:.1f}%',
+        title=f'{name} VIX vs 历史波动率 ({period}) | VIX百分位: {all_label} {all_percentile:.1f}% / 过去一年 {year_percentile:.1f}%',
         xaxis_title='日期',
         yaxis_title='波动率 (%)',
         hovermode='x unified',
@@ -264,28 +553,154 @@ def generate_vix_chart(code, name):
     
     return fig
 
-def get_latest_stats(code):
-    """获取最新统计数据"""
-    hv_df = load_hv_data(code)
-    vix_df = load_vix_data(code)
-    etf_df = load_etf_data(code)
+def _tail_snapshot(code):
+    """只读取历史/HV/VIX文件的最后一行, 返回其中可用的字段"""
+    paths = {
+        'etf': os.path.join(DATA_DIR, 'volatility', f'{code}_full_history.csv'),
+        'hv': os.path.join(DATA_DIR, 'volatility', f'{code}_with_hv.csv'),
+        'vix': os.path.join(DATA_DIR, 'vix', f'{code}_vix.csv')
+    }
+    latest = {key: _read_last_row(path) if os.path.exists(path) else None for key, path in paths.items()}
+    
+    values = {}
+    if latest['etf'] is not None:
+        values['last_date'] = f"{pd.Timestamp(latest['etf']['trade_date']):%Y-%m-%d}"
+        values['price'] = latest['etf']['close']
+    if latest['hv'] is not None:
+        values['hv_date'] = f"{pd.Timestamp(latest['hv']['trade_date']):%Y-%m-%d}"
+        for key in ['HV20', 'HV60', 'HV252']:
+            values[key] = latest['hv'][key]
+    if latest['vix'] is not None:
+        values['vix_date'] = f"{pd.Timestamp(latest['vix']['trade_date']):%Y-%m-%d}"
+        values['VIX'] = latest['vix']['VIX']
+    return values
+
+def load_latest_values(code):
+    """最新数值: 优先使用快照, 快照缺少的字段从各文件最后一行补齐"""
+    snapshot = load_latest_snapshot(code) or {}
+    required = ['last_date', 'price', 'HV20', 'HV60', 'HV252', 'VIX']
     
-    if hv_df is None or vix_df is None or etf_df is None:
+    if any(snapshot.get(key) is None for key in required):
+        for key, value in _tail_snapshot(code).items():
+            if snapshot.get(key) is None:
+                snapshot[key] = value
+    
+    if snapshot.get('last_date') is None or snapshot.get('price') is None:
         return None
+    return snapshot
+
+def _format_pct(value):
+    """百分比格式化, 缺失值显示N/A"""
+    if value is None or pd.isna(value):
+        return 'N/A'
+    return f'{value:.2f}%'
+
+def get_latest_stats(code):
+    """获取最新统计数据
     
-    # 获取最新数据
-    latest_hv = hv_df.iloc[-1]
-    latest_vix = vix_df.iloc[-1]['VIX'] if not vix_df.empty else None
-    latest_price = etf_df.iloc[-1]['close']
-    latest_date = etf_df.index[-1]
+    优先读取更新流程写入的快照, 快照不完整时只读取各文件最后一行, 耗时与历史长度无关
+    """
+    snapshot = load_latest_values(code)
+    if snapshot is None:
+        return None
     
     stats = {
-        '最新日期': latest_date.strftime('%Y-%m-%d'),
-        '最新价格': f'{latest_price:.3f}',
-        'VIX': f'{latest_vix:.2f}%' if latest_vix else 'N/A',
-        'HV20': f'{latest_hv["HV20"]:.2f}%',
-        'HV60': f'{latest_hv["HV60"]:.2f}%',
-        'HV252': f'{latest_hv["HV252"]:.2f}%'
+        '最新日期': snapshot['last_date'],
+        '最新价格': f"{snapshot['price']:.3f}",
+        'VIX': _format_pct(snapshot.get('VIX')),
+        'HV20': _format_pct(snapshot.get('HV20')),
+        'HV60': _format_pct(snapshot.get('HV60')),
+        'HV252': _format_pct(snapshot.get('HV252'))
     }
     
     return stats
+
+def generate_smile_chart(code, name, trade_date=None, max_expiries=4):
+    """生成波动率微笑/偏斜图(虚值认沽+虚值认购, 按到期月份分线)"""
+    df = load_greeks_data(code, trade_date)
+    
+    if df is None or df.empty:
+        return None
+    
+    df = df.dropna(subset=['IV'])
+    spot = df['underlying_price'].iloc[0]
+    day = df['trade_date'].iloc[0]
+    
+    # 行权价低于标的取认沽, 高于标的取认购
+    otm = df[((df['call_put'] == 'P') & (df['exercise_price'] < spot)) |
+             ((df['call_put'] == 'C') & (df['exercise_price'] >= spot))]
+    
+    fig = go.Figure()
+    
+    for dte in sorted(otm['dte'].unique())[:max_expiries]:
+        term = otm[otm['dte'] == dte].sort_values('exercise_price')
+        fig.add_trace(go.Scatter(
+            x=term['exercise_price'],
+            y=term['IV'],
+            mode='lines+markers',
+            name=f'{dte}天到期',
+            line=dict(width=1.5),
+            marker=dict(size=5)
+        ))
+    
+    # 标的价格竖线
+    fig.add_vline(
+        x=spot,
+        line_dash="dash",
+        line_color="gray",
+        opacity=0.5,
+        annotation_text=f"标的: {spot:.3f}",
+        annotation_position="top"
+    )
+    
+    fig.update_layout(
+        title=f'{name} 波动率微笑 | {day:%Y-%m-%d}',
+        xaxis_title='行权价',
+        yaxis_title='隐含波动率 (%)',
+        hovermode='x unified',
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
+
+def generate_term_structure_chart(code, name, trade_date=None):
+    """生成ATM隐含波动率期限结构图"""
+    df = load_greeks_data(code, trade_date)
+    
+    if df is None or df.empty:
+        return None
+    
+    df = df.dropna(subset=['IV']).copy()
+    spot = df['underlying_price'].iloc[0]
+    day = df['trade_date'].iloc[0]
+    
+    # 每个到期月份取最接近平值的行权价, 认购认沽IV取均值
+    df['distance'] = (df['exercise_price'] - spot).abs()
+    atm = df[df['distance'] == df.groupby('dte')['distance'].transform('min')]
+    term = atm.groupby('dte')['IV'].mean()
+    
+    if term.empty:
+        return None
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=term.index,
+        y=term.values,
+        mode='lines+markers',
+        name='ATM IV',
+        line=dict(color='#d62728', width=2),
+        marker=dict(size=7)
+    ))
+    
+    fig.update_layout(
+        title=f'{name} ATM隐含波动率期限结构 | {day:%Y-%m-%d}',
+        xaxis_title='剩余天数',
+        yaxis_title='隐含波动率 (%)',
+        hovermode='x unified',
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
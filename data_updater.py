@@ -10,6 +10,8 @@ from scipy.optimize import brentq
 import os
 import sys
 import time
+import json
+import tempfile
 
 # 添加父目录到路径
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -31,6 +33,17 @@ pro = ts.pro_api()
 CONTRACT_UNIT = 10000
 RISK_FREE_RATE = 0.03
 
+# VIX计算方法: 'atm' 为ATM期权隐含波动率加权, 'variance_swap' 为CBOE/iVIX方差互换法
+DEFAULT_VIX_METHOD = 'atm'
+VIX_TARGET_DAYS = 30
+VIX_MIN_DTE = 7  # 剩余期限不足7天的到期月份不参与方差互换法计算
+IV_BOUNDS = (0.01, 5.0)
+
+# 波动率锥
+CONE_HORIZONS = [10, 20, 60, 120, 252]
+CONE_PERCENTILES = [10, 25, 50, 75, 90]
+CONE_BIN_WIDTH = 0.1  # 直方图分箱宽度(波动率百分点)
+
 # 只使用5个目标ETF
 TARGET_ETFS = [
     {'code': '510050.SH', 'name': '50ETF'},
@@ -40,6 +53,59 @@ TARGET_ETFS = [
     {'code': '159915.SZ', 'name': 'ChiNext_EFund'}
 ]
 
+def _latest_percentiles(values):
+    """最后一个有效值的日期、数值及其在全历史和过去一年中的百分位(values以日期为索引)"""
+    values = values.dropna()
+    if values.empty:
+        return None, None, None, None
+    
+    current = values.iloc[-1]
+    all_percentile = (values < current).sum() / len(values) * 100
+    values_1y = values[values.index >= values.index[-1] - pd.Timedelta(days=365)]
+    year_percentile = (values_1y < current).sum() / len(values_1y) * 100
+    return values.index[-1].strftime('%Y-%m-%d'), float(current), float(all_percentile), float(year_percentile)
+
+def update_latest_snapshot(code, **fields):
+    """合并字段到data/latest/{code}_latest.json
+    
+    先写临时文件再os.replace, 读取方不会看到写了一半的文件
+    """
+    latest_dir = os.path.join(DATA_DIR, 'latest')
+    os.makedirs(latest_dir, exist_ok=True)
+    snapshot_path = os.path.join(latest_dir, f'{code}_latest.json')
+    
+    snapshot = {}
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    
+    for key, value in fields.items():
+        if isinstance(value, float) and np.isnan(value):
+            value = None
+        snapshot[key] = value
+    
+    fd, tmp_path = tempfile.mkstemp(dir=latest_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, snapshot_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+def _snapshot_price(code, history):
+    """由ETF历史数据写入最新价格快照"""
+    close = pd.Series(history['close'].to_numpy(), index=pd.to_datetime(history['trade_date']))
+    close = close.sort_index()
+    last_date, price, all_percentile, year_percentile = _latest_percentiles(close)
+    update_latest_snapshot(
+        code,
+        last_date=last_date,
+        price=price,
+        price_pct_all=all_percentile,
+        price_pct_1y=year_percentile
+    )
+
 def update_etf_history(code, name):
     """增量更新ETF历史数据到data/volatility目录"""
     print(f"更新 {name} 历史数据...")
@@ -78,6 +144,8 @@ def update_etf_history(code, name):
         
         if new_data.empty:
             print(f"  无新数据")
+            if not existing.empty:
+                _snapshot_price(code, existing)
             return False
         
         new_data['trade_date'] = pd.to_datetime(new_data['trade_date']).dt.normalize()
@@ -93,6 +161,7 @@ def update_etf_history(code, name):
         # 保存时只保留日期部分
         updated['trade_date'] = updated['trade_date'].dt.date
         updated.to_csv(file_path, index=False)
+        _snapshot_price(code, updated)
         
         print(f"  新增 {len(new_data)} 条数据")
         return True
@@ -142,6 +211,25 @@ def update_hv(code, name):
         output_path = os.path.join(DATA_DIR, 'volatility', f'{code}_with_hv.csv')
         df_with_hv.to_csv(output_path, index=False)
         
+        # 更新最新快照
+        # 日期、HV数值和百分位都取自最后一个HV20有效的交易日
+        _, _, hv20_all, hv20_1y = _latest_percentiles(hv['HV20'])
+        valid_hv = hv.dropna(subset=['HV20'])
+        latest_hv = valid_hv.iloc[-1] if not valid_hv.empty else hv.iloc[-1]
+        update_latest_snapshot(
+            code,
+            hv_date=latest_hv.name.strftime('%Y-%m-%d'),
+            HV20=float(latest_hv['HV20']),
+            HV60=float(latest_hv['HV60']),
+            HV252=float(latest_hv['HV252']),
+            hv20_pct_all=hv20_all,
+            hv20_pct_1y=hv20_1y
+        )
+        
+        # 增量更新波动率锥
+        if update_hv_cone(code, df['close']):
+            print(f"  波动率锥已更新")
+        
         print(f"  计算完成")
         return True
         
@@ -149,6 +237,113 @@ def update_hv(code, name):
         print(f"  错误: {e}")
         return False
 
+def _cone_percentiles(hist):
+    """由分箱直方图(bin -> count)插值计算百分位"""
+    hist = hist.sort_index()
+    cum = hist.cumsum()
+    total = cum.iloc[-1]
+    
+    values = {}
+    for q in CONE_PERCENTILES:
+        target = q / 100 * total
+        pos = int(np.searchsorted(cum.to_numpy(), target))
+        count = hist.iloc[pos]
+        below = cum.iloc[pos] - count
+        values[f'p{q}'] = (hist.index[pos] + (target - below) / count) * CONE_BIN_WIDTH
+    return values
+
+def _write_csv_atomic(df, path):
+    """先写临时文件再os.replace"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            df.to_csv(f, index=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+def update_hv_cone(code, close):
+    """增量更新波动率锥表
+    
+    各期限HV的分布以固定宽度直方图保存在{code}_hv_cone_hist.csv中,
+    只对上次之后新增的交易日计算HV并累加计数,再由直方图得到百分位带,
+    写入{code}_hv_cone.csv(每个期限一行)供图表直接读取。
+    已计入的最后日期以直方图文件为准, 两个文件都原子写入且直方图最后写,
+    中途失败时下次会从直方图记录的日期重新累加, 不会重复计数
+    """
+    table_path = os.path.join(DATA_DIR, 'volatility', f'{code}_hv_cone.csv')
+    hist_path = os.path.join(DATA_DIR, 'volatility', f'{code}_hv_cone_hist.csv')
+    
+    close = close.dropna()
+    last_date = None
+    if os.path.exists(table_path) and os.path.exists(hist_path):
+        table = pd.read_csv(table_path, index_col='horizon')
+        hist = pd.read_csv(hist_path)
+        if 'last_date' in hist.columns and not hist.empty:
+            last_date = pd.Timestamp(hist['last_date'].iloc[0])
+        
+        # 历史数据被改写(如最后日期不存在)或期限配置变化时重建;
+        # 只比较截至last_date已有数据的期限(上市不足252日的ETF没有HV252)
+        if last_date is not None and last_date in close.index:
+            n_prices = close.index.get_loc(last_date) + 1
+            expected = {h for h in CONE_HORIZONS if n_prices > h}
+            if set(hist['horizon']) != expected or not set(table.index) <= expected:
+                last_date = None
+        else:
+            last_date = None
+    
+    if last_date is None:
+        hv = calculate_historical_volatility(close, windows=CONE_HORIZONS)
+        hist = pd.DataFrame(columns=['horizon', 'bin', 'count'])
+        extremes = {}
+    else:
+        # 只取计算新增日期所需的价格尾部
+        pos = close.index.get_loc(last_date)
+        tail = close.iloc[max(0, pos + 1 - max(CONE_HORIZONS)):]
+        hv = calculate_historical_volatility(tail, windows=CONE_HORIZONS)
+        hv = hv[hv.index > last_date]
+        if hv.empty:
+            return False
+        hist = hist[['horizon', 'bin', 'count']]
+        extremes = table[['min', 'max', 'current']].to_dict('index')
+    
+    # 累加直方图计数
+    new_counts = []
+    for horizon in CONE_HORIZONS:
+        values = hv[f'HV{horizon}'].dropna()
+        bins = np.floor(values / CONE_BIN_WIDTH).astype(int).value_counts()
+        new_counts.append(pd.DataFrame({'horizon': horizon, 'bin': bins.index, 'count': bins.values}))
+        if not values.empty:
+            prev = extremes.get(horizon, {'min': np.inf, 'max': -np.inf})
+            extremes[horizon] = {
+                'min': min(prev['min'], values.min()),
+                'max': max(prev['max'], values.max()),
+                'current': values.iloc[-1]
+            }
+    hist = pd.concat([hist] + new_counts).groupby(['horizon', 'bin'], as_index=False)['count'].sum()
+    hist = hist.astype({'horizon': int, 'bin': int, 'count': int})
+    
+    rows = []
+    for horizon in CONE_HORIZONS:
+        counts = hist[hist['horizon'] == horizon].set_index('bin')['count']
+        if counts.sum() == 0:
+            continue
+        row = {'horizon': horizon, 'count': int(counts.sum()), **extremes[horizon]}
+        for key, value in _cone_percentiles(counts).items():
+            row[key] = min(max(value, row['min']), row['max'])
+        rows.append(row)
+    
+    columns = ['horizon', 'count', 'min'] + [f'p{q}' for q in CONE_PERCENTILES] + ['max', 'current']
+    cone = pd.DataFrame(rows, columns=columns)
+    cone['last_date'] = hv.index[-1].date()
+    
+    hist['last_date'] = cone['last_date'].iloc[0]
+    
+    _write_csv_atomic(cone, table_path)
+    _write_csv_atomic(hist, hist_path)
+    return True
+
 def black_scholes_price(S, K, T, r, sigma, option_type='C'):
     """Black-Scholes期权定价"""
     if T <= 0:
@@ -231,59 +426,180 @@ def calculate_vix_for_date(day_options, underlying_price):
     
     return vix
 
-def update_vix(code, name):
-    """增量更新VIX到data/vix目录(只计算新日期的VIX)"""
-    print(f"更新 {name} VIX...")
+def calculate_vix_atm(opt_df):
+    """ATM隐含波动率加权法计算VIX序列(逐日调用calculate_vix_for_date)"""
+    vix_data = []
+    for date, day_options in opt_df.groupby('trade_date'):
+        underlying_price = day_options.iloc[0]['underlying_price']
+        vix_data.append({
+            'trade_date': date,
+            'VIX': calculate_vix_for_date(day_options, underlying_price)
+        })
+    
+    return pd.DataFrame(vix_data, columns=['trade_date', 'VIX']).set_index('trade_date')
+
+def calculate_vix_variance_swap(opt_df, r=RISK_FREE_RATE):
+    """方差互换法(CBOE/iVIX)计算VIX序列
+    
+    对所有交易日、所有到期月份、全部行权价的虚值期权一次性做数组运算,
+    不需要逐合约求解隐含波动率。取跨越30天的近月/次近月方差插值到30天恒定期限。
+    """
+    dates = pd.DatetimeIndex(opt_df['trade_date'].unique(), name='trade_date').sort_values()
+    opts = opt_df[(opt_df['dte'] >= VIX_MIN_DTE) & (opt_df['close'] > 0)]
+    
+    # 每个(日期, 期限, 行权价)一行, C/P收盘价各一列
+    quotes = opts.pivot_table(
+        index=['trade_date', 'dte', 'exercise_price'],
+        columns='call_put',
+        values='close',
+        aggfunc='mean'
+    ).reindex(columns=['C', 'P']).reset_index()
+    quotes.columns.name = None
+    
+    term = ['trade_date', 'dte']
+    quotes['T'] = quotes['dte'] / 365.0
+    quotes['growth'] = np.exp(r * quotes['T'])
+    
+    # 远期价格: 认购认沽价差最小的行权价处 F = K + e^(rT) * (C - P)
+    quotes['spread'] = quotes['C'] - quotes['P']
+    fwd_idx = quotes['spread'].abs().dropna().groupby([quotes['trade_date'], quotes['dte']]).idxmin()
+    fwd = quotes.loc[fwd_idx, term].copy()
+    fwd['F'] = (quotes.loc[fwd_idx, 'exercise_price'] + quotes.loc[fwd_idx, 'growth'] * quotes.loc[fwd_idx, 'spread']).to_numpy()
+    quotes = quotes.merge(fwd, on=term, how='inner')
     
+    # K0: 不高于F的最大行权价(F低于所有行权价时取最低行权价)
+    strikes = quotes['exercise_price']
+    quotes['K0'] = strikes.where(strikes <= quotes['F']).groupby([quotes['trade_date'], quotes['dte']]).transform('max')
+    quotes['K0'] = quotes['K0'].fillna(strikes.groupby([quotes['trade_date'], quotes['dte']]).transform('min'))
+    
+    # 虚值期权价格: K<K0取认沽, K>K0取认购, K=K0取两者均值
+    quotes['Q'] = np.where(
+        strikes < quotes['K0'], quotes['P'],
+        np.where(strikes > quotes['K0'], quotes['C'], quotes[['C', 'P']].mean(axis=1))
+    )
+    quotes = quotes[quotes['Q'] > 0].sort_values(term + ['exercise_price'], ignore_index=True)
+    
+    # 行权价间距: 相邻行权价差的一半, 两端取单侧间距
+    by_term = quotes.groupby(term)['exercise_price']
+    prev_k = by_term.shift(1)
+    next_k = by_term.shift(-1)
+    strikes = quotes['exercise_price']
+    delta_k = ((next_k - prev_k) / 2).fillna(next_k - strikes).fillna(strikes - prev_k)
+    quotes['contrib'] = delta_k / strikes ** 2 * quotes['growth'] * quotes['Q']
+    
+    terms = quotes.dropna(subset=['contrib']).groupby(term).agg(
+        T=('T', 'first'),
+        F=('F', 'first'),
+        K0=('K0', 'first'),
+        contrib=('contrib', 'sum')
+    ).reset_index()
+    terms['sigma2'] = 2 / terms['T'] * terms['contrib'] - (terms['F'] / terms['K0'] - 1) ** 2 / terms['T']
+    
+    # 每日选取跨越30天的两个期限; 不足以跨越时取最近的两个期限
+    by_day = terms.groupby('trade_date')['dte']
+    rank = by_day.cumcount()
+    n_terms = by_day.transform('size')
+    n_within = (terms['dte'] <= VIX_TARGET_DAYS).groupby(terms['trade_date']).transform('sum')
+    near_rank = (n_within - 1).clip(lower=0).clip(upper=(n_terms - 2).clip(lower=0))
+    next_rank = (near_rank + 1).clip(upper=n_terms - 1)
+    
+    near = terms[rank == near_rank].set_index('trade_date')
+    nxt = terms[rank == next_rank].set_index('trade_date')
+    
+    # 两个期限跨越30天时按T*sigma^2线性插值到30天;
+    # 不能跨越(或只有一个期限)时不外推, 直接取离30天最近的期限的年化方差
+    span = (nxt['dte'] - near['dte']).replace(0, np.nan)
+    w_near = (nxt['dte'] - VIX_TARGET_DAYS) / span
+    bracketed = (w_near >= 0) & (w_near <= 1)
+    total_var = near['T'] * near['sigma2'] * w_near + nxt['T'] * nxt['sigma2'] * (1 - w_near)
+    nearest_var = near['sigma2'].where(w_near.fillna(1.0) >= 1, nxt['sigma2'])
+    var_30 = (total_var * 365.0 / VIX_TARGET_DAYS).where(bracketed, nearest_var)
+    
+    vix = 100 * np.sqrt(var_30.where(var_30 > 0))
+    return vix.rename('VIX').to_frame().reindex(dates)
+
+VIX_METHODS = {
+    'atm': calculate_vix_atm,
+    'variance_swap': calculate_vix_variance_swap
+}
+
+def load_processed_options(code):
+    """加载处理后的期权数据"""
     processed_path = os.path.join(DATA_DIR, 'multi_etf', f'{code}_processed.csv')
+    if not os.path.exists(processed_path):
+        return None
+    
+    opt_df = pd.read_csv(processed_path, low_memory=False)
+    opt_df['trade_date'] = pd.to_datetime(opt_df['trade_date']).dt.normalize()
+    return opt_df
+
+def _snapshot_vix(code, vix_df):
+    """由VIX数据写入最新VIX快照"""
+    vix = pd.Series(vix_df['VIX'].to_numpy(), index=pd.to_datetime(vix_df['trade_date']))
+    vix = vix.sort_index()
+    vix_date, latest, all_percentile, year_percentile = _latest_percentiles(vix)
+    # 没有method列的旧文件均由ATM法计算
+    method = vix_df['method'].dropna().iloc[-1] if 'method' in vix_df and vix_df['method'].notna().any() else 'atm'
+    update_latest_snapshot(
+        code,
+        vix_method=method,
+        vix_date=vix_date,
+        VIX=latest,
+        vix_pct_all=all_percentile,
+        vix_pct_1y=year_percentile
+    )
+
+def update_vix(code, name, method=DEFAULT_VIX_METHOD):
+    """增量更新VIX到data/vix目录(只计算新日期的VIX)"""
+    print(f"更新 {name} VIX ({method})...")
+    
     vix_path = os.path.join(DATA_DIR, 'vix', f'{code}_vix.csv')
     
-    if not os.path.exists(processed_path):
-        print(f"  处理后的期权数据不存在,跳过")
+    if method not in VIX_METHODS:
+        print(f"  未知的VIX计算方法: {method}")
         return False
     
     try:
         # 加载期权数据
-        opt_df = pd.read_csv(processed_path, low_memory=False)
-        opt_df['trade_date'] = pd.to_datetime(opt_df['trade_date']).dt.normalize()
+        opt_df = load_processed_options(code)
+        if opt_df is None:
+            print(f"  处理后的期权数据不存在,跳过")
+            return False
         
-        # 确定需要计算的日期
+        existing_vix = pd.DataFrame()
         if os.path.exists(vix_path):
             existing_vix = pd.read_csv(vix_path)
             existing_vix['trade_date'] = pd.to_datetime(existing_vix['trade_date']).dt.normalize()
+            
+            # 没有method列的旧文件均由ATM法计算; 方法不一致时整段重算, 避免同一序列混用两种方法
+            stored_methods = set(existing_vix.get('method', pd.Series('atm', index=existing_vix.index)).fillna('atm'))
+            if stored_methods != {method}:
+                print(f"  已有VIX由 {','.join(sorted(stored_methods))} 方法计算, 改用 {method} 重新计算全部历史")
+                existing_vix = pd.DataFrame()
+        
+        # 确定需要计算的日期
+        if not existing_vix.empty:
             last_vix_date = existing_vix['trade_date'].max()
             dates_to_calc = opt_df[opt_df['trade_date'] > last_vix_date]['trade_date'].unique()
             print(f"  最后VIX日期: {last_vix_date.date()}")
         else:
             dates_to_calc = opt_df['trade_date'].unique()
-            existing_vix = pd.DataFrame()
-            print(f"  首次计算VIX")
+            print(f"  计算全部历史VIX")
         
         if len(dates_to_calc) == 0:
             print(f"  无新日期需要计算")
+            _snapshot_vix(code, existing_vix)
             return False
         
         print(f"  计算 {len(dates_to_calc)} 个新日期的VIX...")
         
         # 计算新日期的VIX
-        new_vix_data = []
-        for date in sorted(dates_to_calc):
-            day_options = opt_df[opt_df['trade_date'] == date]
-            
-            if day_options.empty:
-                continue
-            
-            underlying_price = day_options.iloc[0]['underlying_price']
-            vix = calculate_vix_for_date(day_options, underlying_price)
-            
-            new_vix_data.append({
-                'trade_date': pd.Timestamp(date).date(),  # 只保留日期
-                'VIX': vix
-            })
+        new_options = opt_df[opt_df['trade_date'].isin(dates_to_calc)]
+        new_vix_df = VIX_METHODS[method](new_options).reset_index()
+        new_vix_df['trade_date'] = new_vix_df['trade_date'].dt.date  # 只保留日期
+        new_vix_df['method'] = method
         
         # 合并数据
-        new_vix_df = pd.DataFrame(new_vix_data)
-        
         if not existing_vix.empty:
             existing_vix['trade_date'] = existing_vix['trade_date'].dt.date
             updated_vix = pd.concat([existing_vix, new_vix_df]).drop_duplicates(subset=['trade_date'])
@@ -292,8 +608,9 @@ def update_vix(code, name):
         
         updated_vix = updated_vix.sort_values('trade_date')
         updated_vix.to_csv(vix_path, index=False)
+        _snapshot_vix(code, updated_vix)
         
-        print(f"  新增 {len(new_vix_data)} 个VIX数据点")
+        print(f"  新增 {len(new_vix_df)} 个VIX数据点")
         return True
         
     except Exception as e:
@@ -302,7 +619,241 @@ def update_vix(code, name):
         traceback.print_exc()
         return False
 
-def update_all_data():
+def compare_vix_methods(code, methods=None):
+    """在同一份期权数据上对比各VIX算法的耗时与结果"""
+    methods = methods or list(VIX_METHODS)
+    
+    opt_df = load_processed_options(code)
+    if opt_df is None:
+        print(f"  {code} 处理后的期权数据不存在")
+        return None, None
+    
+    series = {}
+    summary = []
+    for method in methods:
+        start = time.perf_counter()
+        vix = VIX_METHODS[method](opt_df)['VIX']
+        elapsed = time.perf_counter() - start
+        
+        series[method] = vix
+        summary.append({
+            '方法': method,
+            '耗时(秒)': round(elapsed, 3),
+            '有效天数': int(vix.notna().sum()),
+            '缺失天数': int(vix.isna().sum()),
+            '均值': round(vix.mean(), 2),
+            '中位数': round(vix.median(), 2)
+        })
+    
+    combined = pd.DataFrame(series)
+    summary_df = pd.DataFrame(summary)
+    
+    # 与第一个方法逐日对比
+    base = methods[0]
+    for method in methods[1:]:
+        both = combined[[base, method]].dropna()
+        print(f"{method} vs {base}: 共同天数 {len(both)}, "
+              f"平均差 {(both[method] - both[base]).mean():.2f}, "
+              f"平均绝对差 {(both[method] - both[base]).abs().mean():.2f}, "
+              f"相关系数 {both[base].corr(both[method]):.3f}")
+    
+    print(summary_df.to_string(index=False))
+    
+    return combined, summary_df
+
+def black_scholes_greeks(S, K, T, r, sigma, is_call):
+    """Black-Scholes批量定价及Greeks(输入均为数组)
+    
+    vega为波动率变动1个百分点的价格变化, theta为每自然日的价格变化
+    """
+    sqrt_t = np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    discount = np.exp(-r * T)
+    pdf_d1 = norm.pdf(d1)
+    
+    call_price = S * norm.cdf(d1) - K * discount * norm.cdf(d2)
+    put_price = K * discount * norm.cdf(-d2) - S * norm.cdf(-d1)
+    decay = -S * pdf_d1 * sigma / (2 * sqrt_t)
+    
+    return {
+        'price': np.where(is_call, call_price, put_price),
+        'delta': np.where(is_call, norm.cdf(d1), norm.cdf(d1) - 1),
+        'gamma': pdf_d1 / (S * sigma * sqrt_t),
+        'vega': S * pdf_d1 * sqrt_t / 100,
+        'theta': np.where(
+            is_call,
+            decay - r * K * discount * norm.cdf(d2),
+            decay + r * K * discount * norm.cdf(-d2)
+        ) / 365
+    }
+
+def implied_volatility_batch(market_price, S, K, T, r, is_call, sigma0=None, max_iter=20, tol=1e-6):
+    """批量计算隐含波动率
+    
+    以sigma0为初值(如前一交易日IV)做向量化牛顿迭代,未收敛的合约再用向量化二分法求解。
+    价格不在无套利区间内的合约返回NaN
+    """
+    market_price = np.asarray(market_price, dtype=float)
+    S, K, T = (np.asarray(x, dtype=float) for x in (S, K, T))
+    is_call = np.asarray(is_call, dtype=bool)
+    lower, upper = IV_BOUNDS
+    
+    intrinsic = np.where(is_call, np.maximum(S - K, 0), np.maximum(K - S, 0))
+    ceiling = np.where(is_call, S, K * np.exp(-r * T))
+    valid = (T > 0) & (market_price > intrinsic) & (market_price < ceiling)
+    
+    # 无初值时使用Brenner-Subrahmanyam近似
+    guess = np.sqrt(2 * np.pi / np.where(T > 0, T, np.nan)) * market_price / S
+    if sigma0 is not None:
+        guess = np.where(np.isfinite(sigma0), sigma0, guess)
+    sigma = np.clip(np.nan_to_num(guess, nan=0.2), lower, upper)
+    
+    # 牛顿迭代
+    converged = ~valid
+    for _ in range(max_iter):
+        active = ~converged
+        if not active.any():
+            break
+        greeks = black_scholes_greeks(S[active], K[active], T[active], r, sigma[active], is_call[active])
+        diff = greeks['price'] - market_price[active]
+        vega = greeks['vega'] * 100
+        done = np.abs(diff) < tol
+        step = np.divide(diff, vega, out=np.zeros_like(diff), where=vega > 1e-8)
+        sigma[active] = np.clip(sigma[active] - step, lower, upper)
+        converged[np.flatnonzero(active)[done]] = True
+    
+    # 二分法兜底
+    pending = valid & ~converged
+    if pending.any():
+        lo = np.full(pending.sum(), lower)
+        hi = np.full(pending.sum(), upper)
+        for _ in range(60):
+            mid = (lo + hi) / 2
+            price = black_scholes_greeks(S[pending], K[pending], T[pending], r, mid, is_call[pending])['price']
+            too_high = price > market_price[pending]
+            hi = np.where(too_high, mid, hi)
+            lo = np.where(too_high, lo, mid)
+        sigma[pending] = (lo + hi) / 2
+    
+    # 落在边界上或定价误差仍超过容差的视为无解(与brentq无变号时一致)
+    final_price = black_scholes_greeks(S, K, T, r, sigma, is_call)['price']
+    at_bound = np.isclose(sigma, lower) | np.isclose(sigma, upper)
+    unsolved = at_bound | ~(np.abs(final_price - market_price) <= tol)
+    
+    sigma[~valid | unsolved] = np.nan
+    return sigma
+
+def _contract_ids(opt_df):
+    """合约标识: 优先使用ts_code, 否则由类型+行权价+到期日拼接"""
+    if 'ts_code' in opt_df.columns:
+        return opt_df['ts_code'].astype(str)
+    
+    expiry = opt_df['trade_date'] + pd.to_timedelta(opt_df['dte'], unit='D')
+    return (opt_df['call_put'] + '_' + opt_df['exercise_price'].map('{:.4f}'.format)
+            + '_' + expiry.dt.strftime('%Y%m%d'))
+
+def calculate_greeks_for_date(day_options, prev_iv=None):
+    """计算单日全部合约的IV和Greeks
+    
+    prev_iv为以合约标识为索引的前一交易日IV(%),用作牛顿迭代初值
+    """
+    day = day_options[(day_options['dte'] > 0) & (day_options['close'] > 0)]
+    contracts = _contract_ids(day)
+    
+    # 同一合约同日有多行时只保留最后一行
+    unique = ~contracts.duplicated(keep='last')
+    day, contracts = day[unique], contracts[unique]
+    if prev_iv is not None:
+        prev_iv = prev_iv.groupby(level=0).last()
+    
+    S = day['underlying_price'].to_numpy(dtype=float)
+    K = day['exercise_price'].to_numpy(dtype=float)
+    T = day['dte'].to_numpy(dtype=float) / 365.0
+    is_call = (day['call_put'] == 'C').to_numpy()
+    
+    sigma0 = None
+    if prev_iv is not None:
+        sigma0 = contracts.map(prev_iv).to_numpy(dtype=float) / 100
+    
+    iv = implied_volatility_batch(day['close'].to_numpy(dtype=float), S, K, T, RISK_FREE_RATE, is_call, sigma0=sigma0)
+    greeks = black_scholes_greeks(S, K, T, RISK_FREE_RATE, iv, is_call)
+    
+    return pd.DataFrame({
+        'trade_date': day['trade_date'].to_numpy(),
+        'contract': contracts.to_numpy(),
+        'call_put': day['call_put'].to_numpy(),
+        'exercise_price': K,
+        'dte': day['dte'].to_numpy(),
+        'underlying_price': S,
+        'close': day['close'].to_numpy(dtype=float),
+        'IV': iv * 100,
+        'delta': greeks['delta'],
+        'gamma': greeks['gamma'],
+        'vega': greeks['vega'],
+        'theta': greeks['theta']
+    })
+
+def update_greeks(code, name):
+    """增量更新逐合约IV和Greeks到data/greeks目录(按月分区的parquet)"""
+    print(f"更新 {name} IV/Greeks...")
+    
+    greeks_dir = os.path.join(DATA_DIR, 'greeks', code)
+    
+    try:
+        opt_df = load_processed_options(code)
+        if opt_df is None:
+            print(f"  处理后的期权数据不存在,跳过")
+            return False
+        
+        # 从最后一个分区取最后交易日的IV作为初值
+        partitions = sorted(f for f in os.listdir(greeks_dir) if f.endswith('.parquet')) if os.path.isdir(greeks_dir) else []
+        prev_iv = None
+        if partitions:
+            last_part = pd.read_parquet(os.path.join(greeks_dir, partitions[-1]), columns=['trade_date', 'contract', 'IV'])
+            last_date = last_part['trade_date'].max()
+            prev_iv = last_part[last_part['trade_date'] == last_date].set_index('contract')['IV']
+            dates_to_calc = opt_df[opt_df['trade_date'] > last_date]['trade_date'].unique()
+            print(f"  最后Greeks日期: {last_date.date()}")
+        else:
+            dates_to_calc = opt_df['trade_date'].unique()
+            print(f"  首次计算Greeks")
+        
+        if len(dates_to_calc) == 0:
+            print(f"  无新日期需要计算")
+            return False
+        
+        print(f"  计算 {len(dates_to_calc)} 个新日期的Greeks...")
+        
+        new_options = opt_df[opt_df['trade_date'].isin(dates_to_calc)]
+        results = []
+        for date, day_options in new_options.groupby('trade_date'):
+            day_greeks = calculate_greeks_for_date(day_options, prev_iv)
+            results.append(day_greeks)
+            prev_iv = day_greeks.dropna(subset=['IV']).set_index('contract')['IV']
+        
+        new_greeks = pd.concat(results, ignore_index=True)
+        
+        # 按月写入分区, 只重写涉及的月份
+        os.makedirs(greeks_dir, exist_ok=True)
+        for month, month_df in new_greeks.groupby(new_greeks['trade_date'].dt.strftime('%Y%m')):
+            part_path = os.path.join(greeks_dir, f'{month}.parquet')
+            if os.path.exists(part_path):
+                month_df = pd.concat([pd.read_parquet(part_path), month_df])
+                month_df = month_df.drop_duplicates(subset=['trade_date', 'contract'], keep='last')
+            month_df = month_df.sort_values(['trade_date', 'dte', 'call_put', 'exercise_price'])
+            month_df.to_parquet(part_path, index=False)
+        
+        print(f"  新增 {len(new_greeks)} 条合约Greeks")
+        return True
+        
+    except Exception as e:
+        print(f"  错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def update_all_data(vix_method=DEFAULT_VIX_METHOD):
     """更新所有ETF的数据到现有data目录"""
     results = []
     
@@ -321,13 +872,17 @@ def update_all_data():
         hv_updated = update_hv(code, name)
         
         # 3. 更新VIX(增量) - 依赖现有的processed数据
-        vix_updated = update_vix(code, name)
+        vix_updated = update_vix(code, name, method=vix_method)
+        
+        # 4. 更新逐合约IV/Greeks(增量)
+        greeks_updated = update_greeks(code, name)
         
         results.append({
             'ETF': name,
             'ETF数据': '✓' if etf_updated else '×',
             'HV': '✓' if hv_updated else '×',
-            'VIX': '✓' if vix_updated else '×'
+            'VIX': '✓' if vix_updated else '×',
+            'Greeks': '✓' if greeks_updated else '×'
         })
     
     print(f"\n{'='*60}")
@@ -340,4 +895,16 @@ def update_all_data():
     return results_df
 
 if __name__ == '__main__':
-    update_all_data()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='ETF波动率数据更新')
+    parser.add_argument('--vix-method', choices=list(VIX_METHODS), default=DEFAULT_VIX_METHOD,
+                        help='VIX计算方法')
+    parser.add_argument('--compare-vix', metavar='CODE',
+                        help='对比各VIX算法在指定ETF上的耗时与结果,不更新数据')
+    args = parser.parse_args()
+    
+    if args.compare_vix:
+        compare_vix_methods(args.compare_vix)
+    else:
+        update_all_data(vix_method=args.vix_method)